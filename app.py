@@ -1,64 +1,88 @@
 from flask import Flask, render_template, redirect, send_file, send_from_directory
 import os
 
+from assets import Assets
+from compress import PrecompressedMiddleware, ResponseCompression
+from images import ResponsiveImages
+from media import MediaRenditions
+from metrics import Metrics
+from notebooks import Notebooks
+from page_cache import PageCache
+
 app = Flask(__name__)
+assets = Assets(app)
+images = ResponsiveImages(app)
+media = MediaRenditions(app)
+notebooks = Notebooks(app)
+page_cache = PageCache(app)
+compression = ResponseCompression(app)
+app.wsgi_app = PrecompressedMiddleware(
+    app.wsgi_app, app.static_folder, app.static_url_path)
+metrics = Metrics(app)
 
 
 @app.route('/')
+@page_cache.cached
 def index():
     projects = [
         {
             'name': 'AQI Display', 
             'description': 'A menu bar app for monitoring air quality',
-            'image': '/static/images/pic1.png',
+            'image': 'images/pic1.png',
             'link': 'AQIdisplay'
             },
         {
             'name': 'Financial Data Analysis ', 
             'description': 'Python, Pandas, Parquets',
-            'image': '/static/images/pic2.png',
+            'image': 'images/pic2.png',
             'link': '/findata'
             },
         {
             'name': 'Food Good', 
             'description': 'iOS app recommending recipes based on ingredients',
-            'image': '/static/images/recipe_recommends.png',
+            'image': 'images/recipe_recommends.png',
             'link': '/foodgood'            
             },
         {
             'name': 'Visual Studies', 
             'description': 'Processing, Python, Matplotlib',
-            'image': '/static/images/test5.jpeg',
+            'image': 'images/test5.jpeg',
             'link': '/artwork'   
             }
     ]
     return render_template('index.html', projects=projects)
 
 @app.route('/AQIdisplay')
+@page_cache.cached
 def aqidisplay():
     return render_template('aqidisplay.html')
 
 @app.route('/foodgood')
+@page_cache.cached
 def foodgood():
     return render_template('foodgood.html')
 
 @app.route('/findata')
+@page_cache.cached
 def projects():
-    return render_template('jupyter1.html')
+    return render_template('jupyter1.html', notebook='strategy_analysis.ipynb')
 
 @app.route('/artwork')
+@page_cache.cached
 def artwork():
     return render_template('jupyter2.html')
 
 @app.route('/artnotebook')
+@page_cache.cached
 def artnotebook():
-    return render_template('jupyter3.html')
+    return render_template('jupyter3.html', notebook='art_notebook.ipynb')
 
 @app.route('/oa_project')
 def oa_project():
     return redirect('https://github.com/jimmmmmmmmmmmy')
 
 @app.route('/resume')
+@page_cache.cached
 def resume():
     return render_template('resume.html')
 
@@ -77,7 +101,11 @@ def download_file():
             as_attachment=True
         )
     except Exception as e:
-        return "Sorry, the download is currently unavailable."
+        app.logger.warning('AQIDisplay.zip download unavailable: %r', e)
+        return "Sorry, the download is currently unavailable.", 404
+
+if app.config['PAGE_CACHE']:
+    page_cache.warm(app)
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
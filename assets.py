@@ -0,0 +1,205 @@
+"""Content-hashed copies of everything under static/.
+
+    python assets.py
+
+writes ``static/dist/`` with one fingerprinted copy per static file
+(``css/style.css`` becomes ``dist/css/style.<hash>.css``) and a
+``manifest.json`` mapping the original names to the fingerprinted ones.
+``url()`` references inside stylesheets are rewritten to the fingerprinted
+names before the stylesheet itself is hashed.
+
+Once a manifest exists, ``url_for('static', filename=...)`` resolves
+through it, and the fingerprinted files under ``/static/dist/`` are served
+as immutable.  Without a manifest URLs are left
+alone, which is what you want while editing files in development.
+"""
+import hashlib
+import json
+import posixpath
+import re
+import shutil
+from pathlib import Path
+
+from flask import request
+
+from compress import ENCODINGS
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+IGNORE = {'.DS_Store'}
+HASH_LENGTH = 10
+IMMUTABLE_MAX_AGE = 31536000
+
+CSS_URL = re.compile(r'''url\(\s*(["']?)([^"')]+)\1\s*\)''')
+
+
+def fingerprint(filename, content):
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    stem, dot, suffix = filename.rpartition('.')
+    if not dot or '/' in suffix:
+        return f'{filename}.{digest}'
+    return f'{stem}.{digest}.{suffix}'
+
+
+def iter_static_files(static_folder):
+    for path in sorted(Path(static_folder).rglob('*')):
+        relative = path.relative_to(static_folder).as_posix()
+        if path.is_file() and path.name not in IGNORE \
+                and not relative.startswith(DIST + '/'):
+            yield relative, path
+
+
+def rewrite_css(filename, text, manifest):
+    """Point relative ``url()`` references in a stylesheet at fingerprinted files."""
+    directory = posixpath.dirname(filename)
+
+    def replace(match):
+        quote, reference = match.groups()
+        if ':' in reference or reference.startswith(('/', '#')):
+            return match.group(0)
+        path, _, query = reference.partition('?')
+        target = posixpath.normpath(posixpath.join(directory, path))
+        if target not in manifest:
+            return match.group(0)
+        relative = posixpath.relpath(manifest[target], directory)
+        if query:
+            relative += '?' + query
+        return f'url({quote}{relative}{quote})'
+
+    return CSS_URL.sub(replace, text)
+
+
+def build_manifest(static_folder, overrides=None):
+    """Write fingerprinted copies and the manifest, and return the manifest.
+
+    ``overrides`` maps static filenames to generated content, which is
+    fingerprinted and served instead of the file on disk (font subsets) or
+    in addition to it (image derivatives).
+    """
+    overrides = overrides or {}
+    static_folder = Path(static_folder)
+    dist = static_folder / DIST
+    if dist.exists():
+        shutil.rmtree(dist)
+
+    files = dict(iter_static_files(static_folder))
+    manifest = {}
+    # Stylesheets go last so the files they reference are already hashed.
+    filenames = sorted(set(files) | set(overrides))
+    for filename in sorted(filenames, key=lambda name: name.endswith('.css')):
+        content = overrides.get(filename)
+        if content is None:
+            content = files[filename].read_bytes()
+        if filename.endswith('.css'):
+            content = rewrite_css(
+                filename, content.decode('utf-8'), manifest).encode('utf-8')
+        hashed = fingerprint(filename, content)
+        destination = dist / hashed
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        destination.write_bytes(content)
+        manifest[filename] = hashed
+
+    (dist / MANIFEST).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
+
+
+class Assets:
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.hashed = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['assets'] = self
+        app.url_defaults(self._fingerprint_static)
+        app.after_request(self._cache_headers)
+        self.load()
+
+    def load(self):
+        path = Path(self.app.static_folder) / DIST / MANIFEST
+        if path.is_file():
+            self.manifest = json.loads(path.read_text())
+        else:
+            self.manifest = {}
+        self.hashed = set(self.manifest.values())
+
+    def build(self, overrides=None):
+        self.manifest = build_manifest(self.app.static_folder, overrides)
+        self.hashed = set(self.manifest.values())
+        return self.manifest
+
+    def _fingerprint_static(self, endpoint, values):
+        if endpoint != 'static' or 'filename' not in values:
+            return
+        hashed = self.manifest.get(values['filename'])
+        if hashed is not None:
+            values['filename'] = f'{DIST}/{hashed}'
+
+    def _cache_headers(self, response):
+        # Only fingerprinted names: the manifest and the other metadata files
+        # in dist/ keep their names and change with every build.
+        filename = (request.view_args or {}).get('filename', '')
+        for suffix in ENCODINGS.values():
+            filename = filename.removesuffix(suffix)
+        if request.endpoint == 'static' and filename.startswith(DIST + '/') \
+                and filename[len(DIST) + 1:] in self.hashed \
+                and response.status_code in (200, 206, 304):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+
+
+class GeneratedFiles:
+    """Base for extensions whose build stage generates static files.
+
+    The template helpers of a subclass add the filenames they are asked for
+    to ``used`` (build.py renders every page to fill it), and ``build()``
+    hands those to ``generate()``, which returns ``(metadata, {filename:
+    bytes})``.  The metadata is kept in ``static/dist/<metadata_name>``.
+    """
+
+    metadata_name = None
+
+    def __init__(self, app=None):
+        self.metadata = {}
+        # Filenames the template helpers have been asked for.
+        self.used = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.load()
+
+    @property
+    def metadata_path(self):
+        return Path(self.app.static_folder) / DIST / self.metadata_name
+
+    def load(self):
+        if self.metadata_path.is_file():
+            self.metadata = json.loads(self.metadata_path.read_text())
+        else:
+            self.metadata = {}
+
+    def generate(self, filenames):
+        raise NotImplementedError
+
+    def build(self):
+        metadata, files = self.generate(sorted(self.used))
+        self.metadata = metadata
+        return metadata, files
+
+    def save(self):
+        self.metadata_path.write_text(
+            json.dumps(self.metadata, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    from app import app
+    for original, hashed in sorted(app.extensions['assets'].build().items()):
+        print(f'{original} -> {DIST}/{hashed}')
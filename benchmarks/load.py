@@ -0,0 +1,321 @@
+"""Load test and page-weight report with regression budgets.
+
+    python -m benchmarks.load [--views 200] [--concurrency 8] [--workers 2]
+                              [--budgets benchmarks/budgets.json]
+                              [--output results.json] [--compare previous.json]
+
+Boots ``app:app`` under gunicorn and, for every route in app.py, runs a
+number of concurrent page views: the route itself followed by the local
+assets on its critical path: preloaded fonts, stylesheets, eagerly loaded
+images and autoplaying videos.  Per route it reports p50/p95/p99 latency of
+the route, page views and requests per second, and the bytes every view
+transfers (with ``Accept-Encoding: br, gzip``, so precompression counts).
+
+Lazy images and ``data-src`` video sources are reported separately as
+deferred bytes, since they load later or only on interaction.  For
+``srcset`` the largest candidate of the preferred format is counted, and for
+a ``<video>`` only its first source, the one a browser would pick.
+
+Results are written as JSON.  ``--compare`` prints the change against an
+earlier run, and the command exits with status 1 when any route goes over
+its latency or byte budget, when one of its assets fails, or when it does
+not answer with the expected status (below 400 unless the budget gives a
+``status``).
+"""
+import argparse
+import gzip
+import http.client
+import json
+import re
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+from benchmarks.server import ROOT, gunicorn
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_BUDGETS = Path(__file__).with_name('budgets.json')
+SKIP_ENDPOINTS = {'static', 'metrics'}
+CSS_URL = re.compile(r'''url\(\s*(["']?)([^"')]+)\1\s*\)''')
+ACCEPT_ENCODING = 'br, gzip' if brotli is not None else 'gzip'
+
+
+class ResourceParser(HTMLParser):
+    """Sort the resources a page references by how soon a browser needs them."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.critical = []
+        self.deferred = []
+        self.in_style = False
+        self.picture_sources = None
+        self.video_source_seen = False
+
+    def add(self, kind, url, critical=True):
+        if url:
+            (self.critical if critical else self.deferred).append((kind, url))
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'link':
+            rel = (attrs.get('rel') or '').split()
+            if 'stylesheet' in rel:
+                self.add('css', attrs.get('href'))
+            elif 'preload' in rel:
+                self.add(attrs.get('as') or 'other', attrs.get('href'))
+        elif tag == 'style':
+            self.in_style = True
+        elif tag == 'picture':
+            self.picture_sources = []
+        elif tag == 'source' and self.picture_sources is not None:
+            self.picture_sources.append(attrs.get('srcset'))
+        elif tag == 'source' and not self.video_source_seen:
+            self.video_source_seen = True
+            self.add('video', attrs.get('src'))
+            self.add('video', attrs.get('data-src'), critical=False)
+        elif tag == 'img':
+            srcset = (self.picture_sources or [None])[0] or attrs.get('srcset')
+            url = largest_candidate(srcset) if srcset else attrs.get('src')
+            self.add('image', url, critical=attrs.get('loading') != 'lazy')
+        elif tag == 'video':
+            self.video_source_seen = 'src' in attrs
+            self.add('image', attrs.get('poster'))
+            self.add('video', attrs.get('src'))
+        if 'data-image' in attrs:
+            self.add('image', attrs['data-image'])
+
+    def handle_endtag(self, tag):
+        if tag == 'style':
+            self.in_style = False
+        elif tag == 'picture':
+            self.picture_sources = None
+
+    def handle_data(self, data):
+        if self.in_style:
+            for match in CSS_URL.finditer(data):
+                if match.group(2).endswith(('.woff2', '.woff', '.ttf')):
+                    self.add('font', match.group(2))
+
+
+def largest_candidate(srcset):
+    candidates = []
+    for candidate in srcset.split(','):
+        parts = candidate.split()
+        if parts:
+            descriptor = parts[1] if len(parts) > 1 else '1x'
+            candidates.append((float(descriptor.rstrip('wx')), parts[0]))
+    return max(candidates)[1] if candidates else None
+
+
+def get(base_url, path):
+    """GET ``path`` without following redirects or decoding the body.
+
+    Returns ``(response, body, seconds)``; the body is read in full so its
+    length is the number of bytes transferred.
+    """
+    parts = urlsplit(base_url)
+    started = time.perf_counter()
+    connection = http.client.HTTPConnection(parts.hostname, parts.port)
+    try:
+        connection.request('GET', path, headers={
+            'Accept-Encoding': ACCEPT_ENCODING, 'Connection': 'close'})
+        response = connection.getresponse()
+        body = response.read()
+    finally:
+        connection.close()
+    return response, body, time.perf_counter() - started
+
+
+def decode(response, body):
+    encoding = response.getheader('Content-Encoding')
+    if encoding == 'br':
+        return brotli.decompress(body)
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    return body
+
+
+def local_resources(page_url, resources):
+    seen = set()
+    for kind, url in resources:
+        parts = urlsplit(urljoin(page_url, url))
+        if parts.scheme or parts.netloc or parts.path in seen:
+            continue
+        seen.add(parts.path)
+        yield kind, parts.path
+
+
+def page_routes():
+    from app import app
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if not rule.arguments and 'GET' in rule.methods \
+                and rule.endpoint not in SKIP_ENDPOINTS:
+            yield rule.rule
+
+
+def inspect_page(base_url, route):
+    """Fetch a route once and work out what it pulls in."""
+    response, body, _ = get(base_url, route)
+    page = {'status': response.status, 'bytes': len(body),
+            'critical': [], 'deferred': []}
+    content_type = response.getheader('Content-Type', '')
+    if response.status != 200 or not content_type.startswith('text/html'):
+        return page
+    parser = ResourceParser()
+    parser.feed(decode(response, body).decode('utf-8', errors='replace'))
+    for key in ('critical', 'deferred'):
+        for kind, path in local_resources(route, getattr(parser, key)):
+            asset, asset_body, _ = get(base_url, path)
+            page[key].append({'kind': kind, 'path': path,
+                              'status': asset.status, 'bytes': len(asset_body)})
+    return page
+
+
+def page_view(base_url, route, assets):
+    started = time.perf_counter()
+    _, body, route_latency = get(base_url, route)
+    transferred = len(body)
+    for path in assets:
+        transferred += len(get(base_url, path)[1])
+    return route_latency, time.perf_counter() - started, transferred
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def load(base_url, route, page, views, concurrency):
+    assets = [asset['path'] for asset in page['critical']]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(
+            lambda _: page_view(base_url, route, assets), range(views)))
+    elapsed = time.perf_counter() - started
+    latencies = [route_latency * 1000 for route_latency, _, _ in results]
+    return {
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'mean_ms': statistics.fmean(latencies),
+        'views_per_second': views / elapsed,
+        'requests_per_second': views * (1 + len(assets)) / elapsed,
+        'bytes_per_view': results[0][2],
+    }
+
+
+def run(views, concurrency, workers):
+    report = {
+        'started': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'views': views, 'concurrency': concurrency, 'workers': workers,
+        'routes': {},
+    }
+    with gunicorn(workers=workers) as base_url:
+        for route in page_routes():
+            page = inspect_page(base_url, route)
+            page['critical_bytes'] = sum(
+                asset['bytes'] for asset in page['critical'])
+            page['deferred_bytes'] = sum(
+                asset['bytes'] for asset in page['deferred'])
+            page.update(load(base_url, route, page, views, concurrency))
+            report['routes'][route] = page
+    return report
+
+
+def check_budgets(report, budgets):
+    failures = []
+    for route, result in report['routes'].items():
+        budget = {**budgets.get('default', {}),
+                  **budgets.get('routes', {}).get(route, {})}
+        expected = budget.pop('status', None)
+        if expected is not None and result['status'] != expected:
+            failures.append(
+                f'{route}: returned {result["status"]}, expected {expected}')
+        elif expected is None and result['status'] >= 400:
+            failures.append(f'{route}: returned {result["status"]}')
+        for key, limit in budget.items():
+            if key in result and result[key] > limit:
+                failures.append(
+                    f'{route}: {key} {result[key]:.0f} > budget {limit}')
+        for asset in result['critical'] + result['deferred']:
+            if asset['status'] >= 400:
+                failures.append(
+                    f'{route}: {asset["path"]} returned {asset["status"]}')
+    return failures
+
+
+def format_report(report, previous=None):
+    header = (f'{"route":<26}{"p50":>8}{"p95":>8}{"p99":>8}{"views/s":>9}'
+              f'{"bytes/view":>12}{"critical":>11}{"deferred":>11}')
+    lines = [header]
+    for route, result in report['routes'].items():
+        lines.append(
+            f'{route:<26}{result["p50_ms"]:>8.1f}{result["p95_ms"]:>8.1f}'
+            f'{result["p99_ms"]:>8.1f}{result["views_per_second"]:>9.1f}'
+            f'{result["bytes_per_view"]:>12}{result["critical_bytes"]:>11}'
+            f'{result["deferred_bytes"]:>11}')
+        before = (previous or {}).get('routes', {}).get(route)
+        if before:
+            lines.append(
+                f'{"  vs previous":<26}'
+                f'{result["p50_ms"] - before["p50_ms"]:>+8.1f}'
+                f'{result["p95_ms"] - before["p95_ms"]:>+8.1f}'
+                f'{result["p99_ms"] - before["p99_ms"]:>+8.1f}'
+                f'{result["views_per_second"] - before["views_per_second"]:>+9.1f}'
+                f'{result["bytes_per_view"] - before["bytes_per_view"]:>+12}'
+                f'{result["critical_bytes"] - before["critical_bytes"]:>+11}'
+                f'{result["deferred_bytes"] - before["deferred_bytes"]:>+11}')
+    lines.append('')
+    lines.append('critical path by kind (bytes):')
+    for route, result in report['routes'].items():
+        kinds = {}
+        for asset in result['critical']:
+            kinds[asset['kind']] = kinds.get(asset['kind'], 0) + asset['bytes']
+        if kinds:
+            summary = ', '.join(f'{kind} {size}' for kind, size in sorted(kinds.items()))
+            lines.append(f'  {route:<24}{summary}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--views', type=int, default=200,
+                        help='page views per route')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=2,
+                        help='gunicorn workers')
+    parser.add_argument('--budgets', type=Path, default=DEFAULT_BUDGETS)
+    parser.add_argument('--output', type=Path,
+                        help='where to write the JSON results')
+    parser.add_argument('--compare', type=Path,
+                        help='earlier JSON results to compare against')
+    args = parser.parse_args()
+
+    report = run(args.views, args.concurrency, args.workers)
+    previous = json.loads(args.compare.read_text()) if args.compare else None
+    print(format_report(report, previous))
+
+    output = args.output or ROOT / 'benchmarks' / 'results' / (
+        report['started'].replace(':', '') + '.json')
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f'\nresults written to {output}')
+
+    budgets = json.loads(args.budgets.read_text()) if args.budgets.is_file() else {}
+    failures = check_budgets(report, budgets)
+    if failures:
+        print('\nover budget:\n  ' + '\n  '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Requests/sec per gunicorn worker with the page cache on and off.
+
+    python -m benchmarks.page_cache [--requests 2000] [--concurrency 4]
+
+Boots a single gunicorn worker twice, once with ``PAGE_CACHE=0`` and once
+with ``PAGE_CACHE=1``, and hammers each template route in turn.
+"""
+import argparse
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.server import gunicorn
+
+ROUTES = [
+    '/', '/AQIdisplay', '/foodgood', '/findata', '/artwork', '/artnotebook',
+    '/resume',
+]
+
+
+def fetch(url, accept_encoding):
+    request = urllib.request.Request(
+        url, headers={'Accept-Encoding': accept_encoding})
+    with urllib.request.urlopen(request) as response:
+        response.read()
+
+
+def requests_per_second(url, total, concurrency, accept_encoding):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in pool.map(lambda _: fetch(url, accept_encoding), range(total)):
+            pass
+    return total / (time.perf_counter() - start)
+
+
+def run(total, concurrency, accept_encoding):
+    results = {}
+    for enabled in ('0', '1'):
+        with gunicorn(workers=1, env={'PAGE_CACHE': enabled}) as base_url:
+            for route in ROUTES:
+                # Warm up the worker before measuring.
+                requests_per_second(
+                    base_url + route, concurrency, concurrency, accept_encoding)
+                results[route, enabled] = requests_per_second(
+                    base_url + route, total, concurrency, accept_encoding)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--accept-encoding', default='identity')
+    args = parser.parse_args()
+
+    results = run(args.requests, args.concurrency, args.accept_encoding)
+    print(f'{"route":<14}{"cache off":>12}{"cache on":>12}{"speedup":>10}')
+    for route in ROUTES:
+        off, on = results[route, '0'], results[route, '1']
+        print(f'{route:<14}{off:>12.0f}{on:>12.0f}{on / off:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Boot ``app:app`` under gunicorn for the benchmarks."""
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def gunicorn(workers=1, env=None, timeout=30):
+    """Run gunicorn in the repository root and yield its base URL."""
+    port = free_port()
+    command = [
+        sys.executable, '-m', 'gunicorn', 'app:app',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--log-level', 'warning',
+    ]
+    process = subprocess.Popen(
+        command, cwd=ROOT, env={**os.environ, **(env or {})})
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with {process.returncode}')
+            try:
+                urllib.request.urlopen(base_url + '/', timeout=5).close()
+                break
+            except (urllib.error.URLError, OSError):
+                if time.monotonic() > deadline:
+                    raise RuntimeError('gunicorn did not start in time')
+                time.sleep(0.1)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
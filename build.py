@@ -0,0 +1,75 @@
+"""Build the production assets under static/dist/.
+
+    python build.py
+
+Renders every page once, then runs every build stage in order: subset the
+fonts to the text of those pages, derive responsive images, transcode the
+videos and render the notebooks the pages use, fingerprint static files
+into ``static/dist/`` and write gzip/brotli siblings for the compressible
+ones.
+bin/post_compile runs this when the app is deployed, and freeze.py runs it
+before exporting the site.
+"""
+import os
+
+import fonts
+import images
+import media
+import notebooks
+from assets import DIST
+from compress import compress_tree, format_report
+
+# Live-only endpoints that are not pages.
+SKIP_ENDPOINTS = {'static', 'metrics'}
+
+
+def render_pages(app):
+    """Render every page once and return ``{url: html}``.
+
+    While this runs, the template helpers of the images, media and notebooks
+    extensions note which files the pages use; their build stages only
+    process those.
+    """
+    client = app.test_client()
+    pages = {}
+    for rule in app.url_map.iter_rules():
+        if rule.arguments or 'GET' not in rule.methods \
+                or rule.endpoint in SKIP_ENDPOINTS:
+            continue
+        response = client.get(rule.rule)
+        if response.status_code == 200 and response.mimetype == 'text/html':
+            pages[rule.rule] = response.get_data(as_text=True)
+        response.close()
+    return pages
+
+
+def build(app, verbose=False):
+    pages = render_pages(app)
+    missing = app.extensions['notebooks'].missing()
+    if missing:
+        app.logger.warning(
+            'Cannot render %s from %s/; those pages will link to the source',
+            ', '.join(missing), notebooks.SOURCE)
+    font_subsets = fonts.subset_fonts(app, pages)
+    image_metadata, derivatives = app.extensions['images'].build()
+    video_metadata, renditions = app.extensions['media'].build()
+    notebook_metadata, notebook_outputs = app.extensions['notebooks'].build()
+    app.extensions['assets'].build(overrides={
+        **font_subsets, **derivatives, **renditions, **notebook_outputs})
+    app.extensions['images'].save()
+    app.extensions['media'].save()
+    app.extensions['notebooks'].save()
+    report = compress_tree(os.path.join(app.static_folder, DIST))
+    # Pages rendered before this point refer to the previous manifest.
+    app.extensions['page_cache'].pages.clear()
+    if verbose:
+        print(fonts.format_report(app, font_subsets))
+        print(images.format_report(app, image_metadata, derivatives))
+        print(media.format_report(app, video_metadata, renditions))
+        print(notebooks.format_report(notebook_metadata, notebook_outputs))
+        print(format_report(report))
+
+
+if __name__ == '__main__':
+    from app import app
+    build(app, verbose=True)
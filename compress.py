@@ -0,0 +1,214 @@
+"""Ahead-of-time gzip and brotli compression.
+
+    python compress.py [directory ...]
+
+writes ``.gz`` and ``.br`` siblings next to every compressible file (HTML,
+CSS, JS, SVG, JSON, ...) under the given directories, ``static/dist/`` by
+default, and prints the bytes saved per file.  Formats that are already
+compressed, such as woff2, mp4 and png, are skipped, and a sibling is only
+kept when it is actually smaller than the original.
+
+:class:`PrecompressedMiddleware` serves those siblings for ``/static/``
+requests when the client accepts them, and :class:`ResponseCompression`
+compresses rendered HTML on the fly at a faster setting.  Brotli output
+needs the optional ``Brotli`` package; without it only gzip is used.
+"""
+import gzip
+import os
+import sys
+from pathlib import Path
+
+from flask import request
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = {
+    '.html', '.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.xml',
+    '.ico', '.csv', '.ipynb',
+}
+MIN_SIZE = 256
+
+# Preferred first when the client rates several encodings equally.
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+# Ahead of time there is no hurry; per request, speed matters more.
+BEST_QUALITY = {'br': 11, 'gzip': 9}
+DYNAMIC_QUALITY = {'br': 5, 'gzip': 6}
+DYNAMIC_MIMETYPES = {'text/html'}
+
+
+def compress_bytes(data, encoding, quality=BEST_QUALITY):
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=quality['gzip'], mtime=0)
+    return brotli.compress(data, quality=quality['br'])
+
+
+def available_encodings():
+    return [encoding for encoding in ENCODINGS
+            if encoding != 'br' or brotli is not None]
+
+
+def is_compressible(path):
+    return Path(path).suffix.lower() in COMPRESSIBLE
+
+
+def choose_encoding(accept_encoding, available):
+    """Pick the best of ``available`` for an ``Accept-Encoding`` value."""
+    accept = parse_accept_header(accept_encoding)
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        if encoding not in available:
+            continue
+        quality = accept[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_file(path):
+    """Write siblings for one file and return ``{encoding: size}``."""
+    data = path.read_bytes()
+    sizes = {}
+    for encoding in available_encodings():
+        sibling = path.with_name(path.name + ENCODINGS[encoding])
+        compressed = compress_bytes(data, encoding)
+        if len(compressed) < len(data):
+            sibling.write_bytes(compressed)
+            sizes[encoding] = len(compressed)
+        elif sibling.exists():
+            sibling.unlink()
+    return sizes
+
+
+def compress_tree(root):
+    """Compress every eligible file under ``root``.
+
+    Returns a list of ``(relative path, original size, {encoding: size})``.
+    """
+    root = Path(root)
+    report = []
+    for path in sorted(root.rglob('*')):
+        if not path.is_file() or not is_compressible(path):
+            continue
+        size = path.stat().st_size
+        if size < MIN_SIZE:
+            continue
+        report.append(
+            (path.relative_to(root).as_posix(), size, compress_file(path)))
+    return report
+
+
+def format_report(report):
+    lines = [f'{"file":<48}{"original":>10}{"gzip":>10}{"br":>10}{"saved":>10}']
+    total_original = total_best = 0
+    for name, size, sizes in report:
+        best = min(sizes.values(), default=size)
+        total_original += size
+        total_best += best
+        lines.append(
+            f'{name:<48}{size:>10}{sizes.get("gzip", "-"):>10}'
+            f'{sizes.get("br", "-"):>10}{size - best:>10}')
+    lines.append(
+        f'{"total":<48}{total_original:>10}{"":>10}{"":>10}'
+        f'{total_original - total_best:>10}')
+    return '\n'.join(lines)
+
+
+class PrecompressedMiddleware:
+    """Serve ``.br``/``.gz`` siblings of static files to clients that accept them.
+
+    The request is handed to the wrapped application with the sibling's path,
+    so Flask's static view still takes care of conditional requests, byte
+    ranges and caching headers; only the encoding headers are adjusted on the
+    way out.
+    """
+
+    def __init__(self, wsgi_app, static_folder, static_url_path):
+        self.wsgi_app = wsgi_app
+        self.static_folder = static_folder
+        self.prefix = static_url_path.rstrip('/') + '/'
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if environ.get('REQUEST_METHOD') not in ('GET', 'HEAD') \
+                or not path.startswith(self.prefix) or not is_compressible(path):
+            return self.wsgi_app(environ, start_response)
+
+        filename = safe_join(self.static_folder, path[len(self.prefix):])
+        if filename is None or not os.path.isfile(filename):
+            return self.wsgi_app(environ, start_response)
+
+        available = [encoding for encoding, suffix in ENCODINGS.items()
+                     if os.path.isfile(filename + suffix)]
+        if not available:
+            return self.wsgi_app(environ, start_response)
+
+        encoding = choose_encoding(
+            environ.get('HTTP_ACCEPT_ENCODING', ''), available)
+        if encoding is not None:
+            environ = dict(environ, PATH_INFO=path + ENCODINGS[encoding])
+
+        def encoding_start_response(status, headers, exc_info=None):
+            headers = Headers(headers)
+            if encoding is not None and status.startswith(('200', '206', '304')):
+                headers['Content-Encoding'] = encoding
+            else:
+                headers.remove('Content-Encoding')
+            vary = headers.get('Vary')
+            headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        return self.wsgi_app(environ, encoding_start_response)
+
+
+class ResponseCompression:
+    """Compress dynamic HTML responses for clients that accept it.
+
+    Static files are left to :class:`PrecompressedMiddleware` and pages from
+    the page cache arrive already encoded; this covers everything else that
+    a view renders.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['compress'] = self
+        app.after_request(self._compress)
+
+    def _compress(self, response):
+        if response.status_code != 200 or response.direct_passthrough \
+                or response.is_streamed or 'Content-Encoding' in response.headers \
+                or response.mimetype not in DYNAMIC_MIMETYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        encoding = choose_encoding(
+            request.headers.get('Accept-Encoding', ''), available_encodings())
+        if encoding is None:
+            return response
+        response.set_data(compress_bytes(data, encoding, DYNAMIC_QUALITY))
+        response.content_encoding = encoding
+        etag, weak = response.get_etag()
+        if etag is not None:
+            response.set_etag(f'{etag}-{ENCODINGS[encoding][1:]}', weak)
+        return response
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        directories = sys.argv[1:]
+    else:
+        from app import app
+        directories = [os.path.join(app.static_folder, 'dist')]
+    for directory in directories:
+        print(directory)
+        print(format_report(compress_tree(directory)))
@@ -0,0 +1,140 @@
+"""Subset the web fonts to the glyphs the site actually uses.
+
+    python fonts.py
+
+collects the visible text of every template under ``templates/`` and of
+every rendered page (which picks up the ``projects`` in ``index()``; see
+``render_pages()`` in build.py), and
+subsets each font in ``static/fonts/`` to those characters.  The subsets are
+handed to the asset manifest in place of the original files, so the
+preload links in base.html, the ``@font-face`` rules in style.css and
+jupyter2.html, and everything else that goes through ``url_for('static')``
+point at fingerprinted subset files without touching the sources.
+
+Needs the optional ``fonttools`` and ``Brotli`` packages; without them the
+original fonts are used unchanged.
+"""
+import hashlib
+import io
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+
+try:
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+except ImportError:
+    subset = None
+
+FONT_SUFFIXES = {'.woff2'}
+CACHE = Path('.build-cache', 'fonts')
+JINJA = re.compile(r'{%.*?%}|{{.*?}}|{#.*?#}', re.DOTALL)
+# Always kept so a stray space or newline never falls back to another font.
+BASE_TEXT = ' \n'
+
+
+class TextExtractor(HTMLParser):
+    """Collect the text a browser would draw, skipping scripts and styles."""
+
+    SKIP = {'script', 'style', 'head', 'title'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self.skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self.skipping:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+
+def visible_text(html):
+    parser = TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return ''.join(parser.parts)
+
+
+def template_text(template_folder):
+    text = []
+    for path in sorted(Path(template_folder).glob('*.html')):
+        text.append(visible_text(JINJA.sub(' ', path.read_text())))
+    return ''.join(text)
+
+
+def used_characters(app, pages):
+    """Characters in the templates and in ``pages``, ``{url: html}``."""
+    folder = Path(app.root_path) / app.template_folder
+    rendered = ''.join(visible_text(html) for html in pages.values())
+    return set(template_text(folder) + rendered + BASE_TEXT)
+
+
+def subset_font(data, characters):
+    # Keep head.modified from the source so the same input gives the same bytes.
+    font = TTFont(io.BytesIO(data), recalcTimestamp=False)
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    options.name_IDs = ['*']
+    options.notdef_outline = True
+    options.drop_tables += ['FFTM']
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=sorted(ord(c) for c in characters))
+    subsetter.subset(font)
+    output = io.BytesIO()
+    font.flavor = 'woff2'
+    font.save(output)
+    return output.getvalue()
+
+
+def subset_fonts(app, pages):
+    """Return ``{static filename: subset bytes}`` for every font.
+
+    Subsets are cached under ``.build-cache/`` keyed by the font and the
+    character set.  Fonts that would not get smaller are left out.
+    """
+    if subset is None:
+        return {}
+    characters = ''.join(sorted(used_characters(app, pages)))
+    static_folder = Path(app.static_folder)
+    cache = Path(app.root_path) / CACHE
+    cache.mkdir(parents=True, exist_ok=True)
+    subsets = {}
+    for path in sorted((static_folder / 'fonts').iterdir()):
+        if path.suffix not in FONT_SUFFIXES:
+            continue
+        original = path.read_bytes()
+        key = hashlib.sha256(original + characters.encode('utf-8')).hexdigest()
+        cached = cache / f'{key}.woff2'
+        if cached.is_file():
+            data = cached.read_bytes()
+        else:
+            data = subset_font(original, characters)
+            cached.write_bytes(data)
+        if len(data) < len(original):
+            subsets[path.relative_to(static_folder).as_posix()] = data
+    return subsets
+
+
+def format_report(app, subsets):
+    lines = [f'{"font":<32}{"original":>10}{"subset":>10}']
+    for filename, data in sorted(subsets.items()):
+        original = (Path(app.static_folder) / filename).stat().st_size
+        lines.append(f'{filename:<32}{original:>10}{len(data):>10}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    from app import app
+    from build import render_pages
+    pages = render_pages(app)
+    print(''.join(sorted(used_characters(app, pages))).strip())
+    print(format_report(app, subset_fonts(app, pages)))
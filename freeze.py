@@ -0,0 +1,150 @@
+"""Freeze the site into a directory of plain files.
+
+    python freeze.py [destination]
+
+Every route in app.py is rendered once and written under ``build/`` (or the
+given destination) so the result can be served by any static file server or
+CDN.  Extensionless page URLs such as ``/AQIdisplay`` are written as
+``AQIdisplay/index.html``, redirects become small meta-refresh pages, and the
+build fails if a route errors or if any page links to a file that was not
+written.  Static files are fingerprinted first (see build.py), so
+everything under ``static/dist/`` can be cached forever, and every
+compressible file in the output gets ``.gz``/``.br`` siblings for servers
+that can serve them directly (nginx ``gzip_static``, most CDNs).
+"""
+import posixpath
+import re
+import sys
+import warnings
+from html import escape
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit, unquote
+
+from flask_frozen import Freezer, MissingURLGeneratorWarning, RedirectWarning
+
+from app import app
+from build import build
+from compress import compress_tree, format_report
+
+app.config.setdefault('FREEZER_STATIC_IGNORE', ['.DS_Store'])
+app.config.setdefault('FREEZER_REDIRECT_POLICY', 'ignore')
+# Live-only endpoints that make no sense in a static export.
+SKIP_ENDPOINTS = {'metrics'}
+# Redirects are rewritten as meta-refresh pages by write_redirects().
+warnings.filterwarnings('ignore', category=RedirectWarning)
+warnings.filterwarnings(
+    'ignore', category=MissingURLGeneratorWarning, message='.*metrics')
+
+LINK_ATTRIBUTE = re.compile(
+    r'''\s(?:href|src|data-src|data-image|data|poster)\s*=\s*(["'])(.*?)\1''')
+LOCATION_ASSIGNMENT = re.compile(r'''location\.href\s*=\s*(["'])(.*?)\1''')
+CSS_URL = re.compile(r'''url\(\s*(["']?)([^"')]+)\1\s*\)''')
+SRCSET = re.compile(r'''\ssrcset\s*=\s*(["'])(.*?)\1''')
+
+REDIRECT_PAGE = '''<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta http-equiv="refresh" content="0; url={location}">
+    <link rel="canonical" href="{location}">
+    <title>Redirecting&hellip;</title>
+</head>
+<body>
+    <a href="{location}">{location}</a>
+</body>
+</html>
+'''
+
+
+class BrokenLinkError(Exception):
+    pass
+
+
+def is_page(url):
+    return '.' not in posixpath.basename(url.rstrip('/'))
+
+
+class SiteFreezer(Freezer):
+
+    compression_report = ()
+
+    def no_argument_rules_urls(self):
+        for endpoint, values in super().no_argument_rules_urls():
+            if endpoint not in SKIP_ENDPOINTS:
+                yield endpoint, values
+
+    def urlpath_to_filepath(self, path):
+        if not path.endswith('/') and is_page(path):
+            path += '/'
+        return super().urlpath_to_filepath(path)
+
+    def freeze(self):
+        build(self.app)
+        urls = super().freeze()
+        self.write_redirects(urls)
+        self.check_links()
+        self.compression_report = compress_tree(self.root)
+        return urls
+
+    def write_redirects(self, urls):
+        client = self.app.test_client()
+        for url in sorted(urls):
+            if not is_page(url):
+                continue
+            response = client.get(url)
+            if response.status_code in (301, 302, 303, 307, 308):
+                location = escape(response.location, quote=True)
+                path = self.root / self.urlpath_to_filepath(url)
+                path.write_text(REDIRECT_PAGE.format(location=location))
+            response.close()
+
+    def check_links(self):
+        broken = []
+        for path in sorted(self.root.rglob('*')):
+            if path.suffix not in ('.html', '.css'):
+                continue
+            relative = path.relative_to(self.root).as_posix()
+            if path.name == 'index.html':
+                base = '/' + relative[:-len('index.html')]
+            else:
+                base = '/' + relative
+            for link in iter_links(path.read_text(errors='replace')):
+                target = local_path(urljoin(base, link))
+                if target is None:
+                    continue
+                if not (self.root / self.urlpath_to_filepath(target)).is_file():
+                    broken.append(f'{base} -> {link}')
+        if broken:
+            raise BrokenLinkError(
+                'Broken links in frozen site:\n  ' + '\n  '.join(broken))
+
+
+def iter_links(text):
+    for pattern in (LINK_ATTRIBUTE, LOCATION_ASSIGNMENT, CSS_URL):
+        for match in pattern.finditer(text):
+            yield match.group(2).strip()
+    for match in SRCSET.finditer(text):
+        for candidate in match.group(2).split(','):
+            if candidate.strip():
+                yield candidate.split()[0]
+
+
+def local_path(url):
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    if '{' in parts.path or '$' in parts.path:
+        # Template literals inside inline scripts, not real links.
+        return None
+    return unquote(parts.path)
+
+
+freezer = SiteFreezer(app)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        app.config['FREEZER_DESTINATION'] = str(Path(sys.argv[1]).resolve())
+    for url in sorted(freezer.freeze()):
+        print(url)
+    print(format_report(freezer.compression_report))
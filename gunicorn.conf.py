@@ -0,0 +1,29 @@
+"""gunicorn settings, picked up automatically from the working directory.
+
+Each worker keeps its own Prometheus metrics, so they write them to a shared
+directory that ``/metrics`` aggregates (see metrics.py).  The directory is
+emptied when gunicorn starts, and a dead worker's live-only series are
+dropped when it exits.
+"""
+import os
+import shutil
+import tempfile
+
+# Must be set before prometheus_client is imported anywhere.
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'website-prometheus'))
+
+
+def on_starting(server):
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,208 @@
+"""Responsive image derivatives.
+
+    python images.py
+
+resizes the raster images under ``static/images/`` that the site actually
+shows to a handful of widths in AVIF, WebP and a JPEG (or PNG, for images
+with transparency) fallback.  Which ones those are is found by rendering
+every page (see build.py) and noting the filenames passed to the template
+helpers below.
+Derivatives are cached under ``.build-cache/images/`` keyed by the source's
+content hash, then fingerprinted through the asset manifest like any other
+static file.  Their sizes are recorded in ``static/dist/images.json``.
+
+Templates use ``responsive_image()`` to emit ``<picture>`` markup with
+``srcset``, ``sizes`` and intrinsic ``width``/``height`` (so nothing shifts
+while images load), and ``image_variant()`` for the URL of the smallest
+derivative that covers a given size.  Without a build both fall back to the
+original file.
+
+Needs the optional ``Pillow`` package; without it no derivatives are made.
+"""
+import hashlib
+import io
+import posixpath
+from pathlib import Path
+
+from flask import url_for
+from markupsafe import Markup, escape
+
+from assets import GeneratedFiles
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+WIDTHS = (320, 640, 960, 1280, 1920)
+RASTER_SUFFIXES = {'.png', '.jpg', '.jpeg'}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp',
+              'jpeg': 'image/jpeg', 'png': 'image/png'}
+SAVE_OPTIONS = {
+    'avif': {'quality': 55, 'speed': 6},
+    'webp': {'quality': 80, 'method': 6},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+    'png': {'optimize': True},
+}
+CACHE = Path('.build-cache', 'images')
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or \
+        (image.mode == 'P' and 'transparency' in image.info)
+
+
+def target_widths(width):
+    widths = [candidate for candidate in WIDTHS if candidate < width]
+    widths.append(min(width, WIDTHS[-1]))
+    return widths
+
+
+def encode(image, width, height, image_format):
+    resized = image.resize((width, height), Image.LANCZOS)
+    if image_format == 'jpeg':
+        resized = resized.convert('RGB')
+    output = io.BytesIO()
+    resized.save(output, image_format.upper(), **SAVE_OPTIONS[image_format])
+    return output.getvalue()
+
+
+def derive(path, filename, cache):
+    """Return ``(metadata, {derivative filename: bytes})`` for one image."""
+    source = path.read_bytes()
+    key = hashlib.sha256(source).hexdigest()[:20]
+    image = Image.open(io.BytesIO(source))
+    image.load()
+    fallback = 'png' if has_alpha(image) else 'jpeg'
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if fallback == 'png' else 'RGB')
+
+    stem = posixpath.splitext(filename)[0]
+    metadata = {'width': image.width, 'height': image.height,
+                'fallback': fallback, 'variants': {}}
+    files = {}
+    for image_format in ('avif', 'webp', fallback):
+        variants = metadata['variants'][image_format] = []
+        for width in target_widths(image.width):
+            height = round(image.height * width / image.width)
+            cached = cache / f'{key}-{width}w.{image_format}'
+            if cached.is_file():
+                data = cached.read_bytes()
+            else:
+                data = encode(image, width, height, image_format)
+                cached.write_bytes(data)
+            name = f'{stem}-{width}w.{image_format}'
+            files[name] = data
+            variants.append([name, width, height])
+    return metadata, files
+
+
+def derive_images(app, filenames):
+    """Derive ``filenames``, returning ``(metadata, {filename: bytes})``."""
+    if Image is None:
+        return {}, {}
+    static_folder = Path(app.static_folder)
+    cache = Path(app.root_path) / CACHE
+    cache.mkdir(parents=True, exist_ok=True)
+    metadata, files = {}, {}
+    for filename in sorted(filenames):
+        path = static_folder / filename
+        if path.suffix.lower() not in RASTER_SUFFIXES or not path.is_file():
+            continue
+        metadata[filename], derived = derive(path, filename, cache)
+        files.update(derived)
+    return metadata, files
+
+
+def format_report(app, metadata, files):
+    lines = [f'{"image":<48}{"original":>10}{"smallest":>10}{"largest":>10}']
+    for filename, info in sorted(metadata.items()):
+        original = (Path(app.static_folder) / filename).stat().st_size
+        sizes = [len(files[name]) for variants in info['variants'].values()
+                 for name, _, _ in variants]
+        lines.append(
+            f'{filename:<48}{original:>10}{min(sizes):>10}{max(sizes):>10}')
+    return '\n'.join(lines)
+
+
+class ResponsiveImages(GeneratedFiles):
+
+    metadata_name = 'images.json'
+
+    def init_app(self, app):
+        app.extensions['images'] = self
+        app.jinja_env.globals['responsive_image'] = self.responsive_image
+        app.jinja_env.globals['image_variant'] = self.image_variant
+        super().init_app(app)
+
+    def generate(self, filenames):
+        return derive_images(self.app, filenames)
+
+    def image_variant(self, filename, width=None, height=None, format='webp'):
+        """URL of the smallest derivative at least ``width`` x ``height``."""
+        self.used.add(filename)
+        info = self.metadata.get(filename)
+        if info is None:
+            return url_for('static', filename=filename)
+        variants = info['variants'].get(format) or \
+            info['variants'][info['fallback']]
+        for name, variant_width, variant_height in variants:
+            if variant_width >= (width or 0) and variant_height >= (height or 0):
+                return url_for('static', filename=name)
+        return url_for('static', filename=variants[-1][0])
+
+    def srcset(self, variants):
+        return ', '.join(
+            f'{url_for("static", filename=name)} {width}w'
+            for name, width, _ in variants)
+
+    def responsive_image(self, filename, alt='', sizes='100vw', loading='lazy',
+                         **attributes):
+        """``<picture>`` markup for a static image.
+
+        Extra keyword arguments become attributes of the ``<img>``;
+        use ``class_`` for ``class``.
+        """
+        self.used.add(filename)
+        info = self.metadata.get(filename)
+        img = {'alt': alt, 'loading': loading, 'decoding': 'async'}
+        img.update((name.rstrip('_').replace('_', '-'), value)
+                   for name, value in attributes.items())
+        if info is None:
+            img['src'] = url_for('static', filename=filename)
+            return Markup(f'<img {format_attributes(img)}>')
+
+        sources = []
+        for image_format in ('avif', 'webp'):
+            variants = info['variants'][image_format]
+            sources.append(format_attributes({
+                'type': MIME_TYPES[image_format],
+                'srcset': self.srcset(variants),
+                'sizes': sizes,
+            }))
+        fallback = info['variants'][info['fallback']]
+        img.update({
+            'src': url_for('static', filename=fallback[-1][0]),
+            'srcset': self.srcset(fallback),
+            'sizes': sizes,
+            'width': info['width'],
+            'height': info['height'],
+        })
+        return Markup(''.join(
+            ['<picture>']
+            + [f'<source {source}>' for source in sources]
+            + [f'<img {format_attributes(img)}>', '</picture>']))
+
+
+def format_attributes(attributes):
+    return ' '.join(
+        f'{name}="{escape(value)}"' for name, value in attributes.items()
+        if value is not None)
+
+
+if __name__ == '__main__':
+    from app import app
+    from build import render_pages
+    render_pages(app)
+    metadata, files = app.extensions['images'].build()
+    print(format_report(app, metadata, files))
@@ -0,0 +1,195 @@
+"""Poster frames and smaller renditions for the videos.
+
+    python media.py
+
+extracts a JPEG poster frame from every clip under ``static/videos/`` that a
+page shows (found by rendering every page, see build.py, and noting the
+filenames passed to ``video_renditions()``) and transcodes it to a lower-bitrate MP4 (H.264, ``faststart``) and a WebM
+(VP9), dropping audio since the clips only ever play muted.  A rendition is
+kept only when it is smaller than the original.  Output is cached under
+``.build-cache/media/`` keyed by the source's content hash and fingerprinted
+through the asset manifest; ``static/dist/media.json`` records what exists
+for each clip.
+
+Templates read that through ``video_renditions()``.  Without a build it
+describes just the original file.
+
+Uses ``ffmpeg`` from the PATH, or the binary shipped with the optional
+``imageio-ffmpeg`` package; without either, no renditions are made.
+"""
+import hashlib
+import mimetypes
+import posixpath
+import re
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from flask import url_for
+
+from assets import GeneratedFiles
+
+try:
+    import imageio_ffmpeg
+except ImportError:
+    imageio_ffmpeg = None
+
+VIDEO_SUFFIXES = {'.mp4', '.webm', '.mov'}
+CACHE = Path('.build-cache', 'media')
+DIMENSIONS = re.compile(r'Stream #.*Video: .*?, (\d{2,5})x(\d{2,5})')
+
+# Listed in order of preference; browsers play the first source they support.
+RENDITIONS = {
+    'webm': ('video/webm', [
+        '-c:v', 'libvpx-vp9', '-crf', '42', '-b:v', '0', '-row-mt', '1',
+        '-deadline', 'good', '-cpu-used', '2', '-an',
+    ]),
+    'mp4': ('video/mp4', [
+        '-c:v', 'libx264', '-preset', 'slow', '-crf', '30',
+        '-pix_fmt', 'yuv420p', '-movflags', '+faststart', '-an',
+    ]),
+}
+POSTER = ['-frames:v', '1', '-q:v', '6', '-f', 'image2', '-c:v', 'mjpeg']
+
+
+def ffmpeg_executable():
+    executable = shutil.which('ffmpeg')
+    if executable is None and imageio_ffmpeg is not None:
+        executable = imageio_ffmpeg.get_ffmpeg_exe()
+    return executable
+
+
+def ffmpeg(executable, source, arguments, suffix):
+    """Run ffmpeg on ``source`` and return the output bytes."""
+    with tempfile.TemporaryDirectory() as directory:
+        output = Path(directory) / f'output{suffix}'
+        subprocess.run(
+            [executable, '-hide_banner', '-loglevel', 'error', '-y',
+             '-i', str(source), *arguments, str(output)],
+            check=True)
+        return output.read_bytes()
+
+
+def dimensions(executable, source):
+    # ffmpeg exits non-zero without an output file, but still prints streams.
+    result = subprocess.run(
+        [executable, '-hide_banner', '-i', str(source)],
+        capture_output=True, text=True)
+    match = DIMENSIONS.search(result.stderr)
+    if match is None:
+        return None, None
+    return int(match.group(1)), int(match.group(2))
+
+
+def cached(cache, key, build):
+    path = cache / key
+    if path.is_file():
+        return path.read_bytes()
+    data = build()
+    path.write_bytes(data)
+    return data
+
+
+def transcode(executable, path, filename, cache):
+    """Return ``(metadata, {rendition filename: bytes})`` for one clip."""
+    source = path.read_bytes()
+    key = hashlib.sha256(source).hexdigest()[:20]
+    stem = posixpath.splitext(filename)[0]
+    width, height = dimensions(executable, path)
+    files = {}
+
+    poster = f'{stem}-poster.jpg'
+    files[poster] = cached(
+        cache, f'{key}-poster.jpg',
+        lambda: ffmpeg(executable, path, POSTER, '.jpg'))
+
+    sources = []
+    for extension, (mimetype, arguments) in RENDITIONS.items():
+        data = cached(
+            cache, f'{key}.{extension}',
+            lambda: ffmpeg(executable, path, arguments, f'.{extension}'))
+        if len(data) < len(source):
+            name = f'{stem}-small.{extension}'
+            files[name] = data
+            sources.append({'filename': name, 'type': mimetype})
+        elif filename.endswith(f'.{extension}'):
+            sources.append({'filename': filename, 'type': mimetype})
+    if not sources:
+        sources.append({'filename': filename,
+                        'type': mimetypes.guess_type(filename)[0]})
+
+    metadata = {'poster': poster, 'width': width, 'height': height,
+                'sources': sources}
+    return metadata, files
+
+
+def transcode_videos(app, filenames):
+    """Transcode ``filenames``, returning ``(metadata, {filename: bytes})``."""
+    executable = ffmpeg_executable()
+    if executable is None:
+        return {}, {}
+    static_folder = Path(app.static_folder)
+    cache = Path(app.root_path) / CACHE
+    cache.mkdir(parents=True, exist_ok=True)
+    metadata, files = {}, {}
+    for filename in sorted(filenames):
+        path = static_folder / filename
+        if path.suffix.lower() not in VIDEO_SUFFIXES or not path.is_file():
+            continue
+        metadata[filename], derived = transcode(executable, path, filename, cache)
+        files.update(derived)
+    return metadata, files
+
+
+def format_report(app, metadata, files):
+    lines = [f'{"video":<28}{"original":>10}{"poster":>10}{"webm":>10}{"mp4":>10}']
+    for filename, info in sorted(metadata.items()):
+        original = (Path(app.static_folder) / filename).stat().st_size
+        sizes = {posixpath.splitext(name)[1][1:]: len(data)
+                 for name, data in files.items()
+                 if name.startswith(posixpath.splitext(filename)[0] + '-')}
+        lines.append(
+            f'{filename:<28}{original:>10}{sizes.get("jpg", "-"):>10}'
+            f'{sizes.get("webm", "-"):>10}{sizes.get("mp4", "-"):>10}')
+    return '\n'.join(lines)
+
+
+class MediaRenditions(GeneratedFiles):
+
+    metadata_name = 'media.json'
+
+    def init_app(self, app):
+        app.extensions['media'] = self
+        app.jinja_env.globals['video_renditions'] = self.video_renditions
+        super().init_app(app)
+
+    def generate(self, filenames):
+        return transcode_videos(self.app, filenames)
+
+    def video_renditions(self, filename):
+        """Poster, dimensions and ``<source>`` URLs for a clip."""
+        self.used.add(filename)
+        info = self.metadata.get(filename)
+        if info is None:
+            return {'poster': None, 'width': None, 'height': None,
+                    'sources': [{'src': url_for('static', filename=filename),
+                                 'type': 'video/mp4'}]}
+        return {
+            'poster': url_for('static', filename=info['poster']),
+            'width': info['width'],
+            'height': info['height'],
+            'sources': [
+                {'src': url_for('static', filename=source['filename']),
+                 'type': source['type']}
+                for source in info['sources']
+            ],
+        }
+
+
+if __name__ == '__main__':
+    from app import app
+    from build import render_pages
+    render_pages(app)
+    metadata, files = app.extensions['media'].build()
+    print(format_report(app, metadata, files))
@@ -0,0 +1,142 @@
+"""Request timing: ``Server-Timing`` headers and Prometheus metrics.
+
+Every response gets ``Server-Timing`` entries for ``route`` (time from the
+start of the request to the end of the view, with the endpoint as
+description), ``render`` (time spent rendering Jinja templates) and
+``total`` (the WSGI call up to the response headers, middleware included).
+Per-endpoint latency, measured until the body has been sent, feeds a
+histogram alongside response size and a request counter by status, exposed
+at ``/metrics`` in the Prometheus text format.
+
+Under gunicorn the workers are separate processes, so gunicorn.conf.py
+points ``PROMETHEUS_MULTIPROC_DIR`` at a shared directory and ``/metrics``
+aggregates the files every worker writes there.
+
+Needs the optional ``prometheus_client`` package for ``/metrics``; without
+it only the ``Server-Timing`` header is sent.
+"""
+import os
+import time
+
+from flask import before_render_template, g, request, template_rendered
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+        generate_latest, multiprocess)
+except ImportError:
+    Counter = None
+
+ENVIRON_KEY = 'metrics.timing'
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+                16777216)
+
+if Counter is not None:
+    REQUESTS = Counter(
+        'flask_http_requests_total', 'Requests by endpoint and status.',
+        ['endpoint', 'method', 'status'])
+    LATENCY = Histogram(
+        'flask_http_request_duration_seconds', 'Time to build a response.',
+        ['endpoint'])
+    RENDER = Histogram(
+        'flask_template_render_duration_seconds', 'Time to render a template.',
+        ['template'])
+    RESPONSE_SIZE = Histogram(
+        'flask_http_response_size_bytes', 'Response body size.',
+        ['endpoint'], buckets=SIZE_BUCKETS)
+
+
+class Metrics:
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['metrics'] = self
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+        if Counter is not None:
+            app.add_url_rule('/metrics', 'metrics', self.metrics)
+        app.wsgi_app = TimingMiddleware(app.wsgi_app)
+
+    def metrics(self):
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return generate_latest(registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
+
+    def _start(self):
+        g.request_started = time.perf_counter()
+        g.render_time = 0.0
+
+    def _start_render(self, app, template, context, **extra):
+        g.render_started = time.perf_counter()
+
+    def _finish_render(self, app, template, context, **extra):
+        started = g.pop('render_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        g.render_time = g.get('render_time', 0.0) + elapsed
+        if Counter is not None:
+            RENDER.labels(template.name or 'string').observe(elapsed)
+
+    def _finish(self, response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        route = time.perf_counter() - started
+        endpoint = request.endpoint or 'none'
+        timing = request.environ.get(ENVIRON_KEY)
+        if timing is not None:
+            timing['endpoint'] = endpoint
+        response.headers.add(
+            'Server-Timing',
+            f'route;dur={route * 1000:.2f};desc="{endpoint}", '
+            f'render;dur={g.get("render_time", 0.0) * 1000:.2f}')
+        return response
+
+
+class TimingMiddleware:
+    """Time the whole WSGI call and record it under the Flask endpoint.
+
+    Sits outside every other middleware, so ``total`` includes them.  The
+    header has to go out before the body, so ``total`` stops at
+    ``start_response``; the latency histogram is observed when the server
+    closes the response, after the body (a file from ``send_file``, say) has
+    been sent.  The endpoint is handed back from Flask through a dict in the
+    environ, which survives the environ copies made by inner middleware.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        started = time.perf_counter()
+        timing = environ[ENVIRON_KEY] = {}
+
+        def timed_start_response(status, headers, exc_info=None):
+            total = time.perf_counter() - started
+            headers = list(headers)
+            headers.append(('Server-Timing', f'total;dur={total * 1000:.2f}'))
+            timing['status'] = status[:3]
+            timing['length'] = next((value for name, value in headers
+                                     if name.lower() == 'content-length'), 0)
+            return start_response(status, headers, exc_info)
+
+        def record():
+            endpoint = timing.get('endpoint', 'none')
+            if Counter is None or endpoint == 'metrics' or 'status' not in timing:
+                return
+            REQUESTS.labels(
+                endpoint, environ.get('REQUEST_METHOD'), timing['status']).inc()
+            LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+            RESPONSE_SIZE.labels(endpoint).observe(int(timing['length']))
+
+        return ClosingIterator(self.wsgi_app(environ, timed_start_response), record)
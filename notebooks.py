@@ -0,0 +1,145 @@
+"""Render the Jupyter notebooks in notebooks/ to HTML at build time.
+
+    python notebooks.py
+
+converts the ``.ipynb`` files under ``notebooks/`` that the pages embed with
+nbconvert's ``basic`` template, so the pages need no third-party viewer, CDN or iframe.  Output
+images are pulled out of the notebook into separate files instead of inline
+base64 and fingerprinted through the asset manifest like any other static
+file.  Conversions are cached under ``.build-cache/notebooks/`` keyed by the
+notebook's name and content hash; the rendered HTML lands in
+``static/dist/notebooks.json``.
+
+Templates call ``notebook_html('name.ipynb')``, which returns the rendered
+markup, or ``None`` when the notebook has not been built, in which case the
+page links to the notebook's source instead.  The build warns about any
+notebook a page asks for (see build.py) that it cannot render.
+
+Needs the optional ``nbconvert`` package, which is only imported at build
+time; without it no notebook is rendered.
+"""
+import hashlib
+import importlib.util
+import posixpath
+from pathlib import Path
+
+from flask import url_for
+from markupsafe import Markup
+
+from assets import GeneratedFiles
+
+# nbconvert is only needed at build time and takes half a second to import,
+# so it is imported in convert() rather than by every gunicorn worker.
+HAVE_NBCONVERT = importlib.util.find_spec('nbconvert') is not None
+
+SOURCE = 'notebooks'
+CACHE = Path('.build-cache', 'notebooks')
+
+
+def convert(path, output_files_dir):
+    """Return ``(html, {output filename: bytes})`` for one notebook."""
+    from nbconvert import HTMLExporter
+    from nbconvert.preprocessors import ExtractOutputPreprocessor
+    from traitlets.config import Config
+
+    config = Config()
+    config.HTMLExporter.preprocessors = [ExtractOutputPreprocessor]
+    config.HTMLExporter.exclude_input_prompt = True
+    config.HTMLExporter.exclude_output_prompt = True
+    exporter = HTMLExporter(config=config, template_name='basic')
+    html, resources = exporter.from_filename(
+        str(path), resources={'output_files_dir': output_files_dir})
+    return html, resources.get('outputs', {})
+
+
+def render(path, name, cache):
+    """Convert one notebook through the cache.
+
+    Returns ``(metadata, {static filename: bytes})``.
+    """
+    # The cached HTML refers to its outputs by the notebook's name.
+    key = hashlib.sha256(
+        name.encode('utf-8') + b'\0' + path.read_bytes()).hexdigest()[:20]
+    output_files_dir = f'notebooks/{posixpath.splitext(name)[0]}'
+    directory = cache / key
+    if (directory / 'index.html').is_file():
+        html = (directory / 'index.html').read_text()
+        outputs = {f'{output_files_dir}/{output.name}': output.read_bytes()
+                   for output in sorted(directory.iterdir())
+                   if output.name != 'index.html'}
+    else:
+        html, outputs = convert(path, output_files_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        for filename, data in outputs.items():
+            (directory / posixpath.basename(filename)).write_bytes(data)
+        (directory / 'index.html').write_text(html)
+    return {'html': html, 'outputs': sorted(outputs)}, outputs
+
+
+def missing_notebooks(app, names):
+    """The notebooks in ``names`` that cannot be rendered."""
+    source = Path(app.root_path) / SOURCE
+    return [name for name in names
+            if not HAVE_NBCONVERT or not (source / name).is_file()]
+
+
+def render_notebooks(app, names):
+    """Render the named notebooks, returning ``(metadata, {filename: bytes})``.
+
+    Notebooks that cannot be rendered are left out.
+    """
+    missing = missing_notebooks(app, names)
+    source = Path(app.root_path) / SOURCE
+    cache = Path(app.root_path) / CACHE
+    metadata, files = {}, {}
+    for name in names:
+        if name in missing:
+            continue
+        metadata[name], outputs = render(source / name, name, cache)
+        files.update(outputs)
+    return metadata, files
+
+
+def format_report(metadata, files):
+    lines = [f'{"notebook":<32}{"html":>10}{"outputs":>10}{"output bytes":>14}']
+    for name, info in sorted(metadata.items()):
+        size = sum(len(files[filename]) for filename in info['outputs'])
+        lines.append(
+            f'{name:<32}{len(info["html"].encode()):>10}'
+            f'{len(info["outputs"]):>10}{size:>14}')
+    return '\n'.join(lines)
+
+
+class Notebooks(GeneratedFiles):
+
+    metadata_name = 'notebooks.json'
+
+    def init_app(self, app):
+        app.extensions['notebooks'] = self
+        app.jinja_env.globals['notebook_html'] = self.notebook_html
+        super().init_app(app)
+
+    def generate(self, filenames):
+        return render_notebooks(self.app, filenames)
+
+    def missing(self):
+        return missing_notebooks(self.app, sorted(self.used))
+
+    def notebook_html(self, name):
+        self.used.add(name)
+        info = self.metadata.get(name)
+        if info is None:
+            return None
+        html = info['html']
+        for filename in info['outputs']:
+            html = html.replace(
+                f'src="{filename}"',
+                f'src="{url_for("static", filename=filename)}" loading="lazy"')
+        return Markup(html)
+
+
+if __name__ == '__main__':
+    from app import app
+    from build import render_pages
+    render_pages(app)
+    print(format_report(*app.extensions['notebooks'].build()))
@@ -0,0 +1,109 @@
+"""Pre-rendered page cache for the template routes.
+
+The pages on this site only change between deploys, so with
+``PAGE_CACHE`` enabled each decorated view is rendered once per worker and
+the bytes are kept in memory together with brotli/gzip variants and a
+strong ETag.  Conditional requests are answered with ``304 Not Modified``.
+In debug mode an entry is rendered again whenever a file under
+``templates/`` changes.
+"""
+import hashlib
+import os
+from functools import wraps
+
+from flask import current_app, request, url_for
+
+from compress import ENCODINGS, available_encodings, choose_encoding, compress_bytes
+
+
+class CachedPage:
+
+    def __init__(self, body, mimetype, templates_version):
+        self.body = body
+        self.mimetype = mimetype
+        self.templates_version = templates_version
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.encoded = {
+            encoding: compress_bytes(body, encoding)
+            for encoding in available_encodings()
+        }
+
+
+class PageCache:
+
+    def __init__(self, app=None):
+        self.pages = {}
+        self.endpoints = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault(
+            'PAGE_CACHE', os.environ.get('PAGE_CACHE', '0') == '1')
+        app.extensions['page_cache'] = self
+
+    def cached(self, view):
+        self.endpoints.append(view.__name__)
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config['PAGE_CACHE']:
+                return view(*args, **kwargs)
+            page = self.pages.get(request.path)
+            if page is None or self._is_stale(page):
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                page = CachedPage(
+                    response.get_data(), response.mimetype,
+                    self._templates_version())
+                self.pages[request.path] = page
+            return self._respond(page)
+
+        return wrapper
+
+    def warm(self, app):
+        """Render every cached route so the first visitor hits a warm cache.
+
+        The views are called directly rather than through the WSGI stack, so
+        warming up does not show up as requests in the metrics.
+        """
+        with app.test_request_context():
+            urls = [url_for(endpoint) for endpoint in self.endpoints]
+        for endpoint, url in zip(self.endpoints, urls):
+            with app.test_request_context(url):
+                app.view_functions[endpoint]()
+
+    def _respond(self, page):
+        encoding = choose_encoding(
+            request.headers.get('Accept-Encoding', ''), page.encoded)
+        response = current_app.response_class(mimetype=page.mimetype)
+        response.vary.add('Accept-Encoding')
+        if encoding is None:
+            response.set_etag(page.etag)
+        else:
+            response.set_etag(f'{page.etag}-{ENCODINGS[encoding][1:]}')
+        # Only the negotiated representation's tag counts: a client holding
+        # the brotli body must not get a 304 when it now asks for identity.
+        if request.if_none_match.contains(response.get_etag()[0]):
+            response.status_code = 304
+            return response
+        if encoding is None:
+            response.set_data(page.body)
+        else:
+            response.set_data(page.encoded[encoding])
+            response.content_encoding = encoding
+        return response
+
+    def _is_stale(self, page):
+        if not current_app.debug:
+            return False
+        return page.templates_version != self._templates_version()
+
+    def _templates_version(self):
+        if not current_app.debug:
+            return None
+        folder = os.path.join(current_app.root_path, current_app.template_folder)
+        return tuple(sorted(
+            (entry.name, entry.stat().st_mtime_ns)
+            for entry in os.scandir(folder) if entry.is_file()))
@@ -0,0 +1,127 @@
+"""Content negotiation, conditional requests and the freeze link checker."""
+import pytest
+from flask import Flask
+
+from app import app
+from assets import Assets
+from compress import PrecompressedMiddleware, compress_tree
+from freeze import BrokenLinkError, SiteFreezer
+
+STYLESHEET = 'body { color: #210c0c; }\n' * 40
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(app.config, 'PAGE_CACHE', True)
+    monkeypatch.setattr(app.extensions['page_cache'], 'pages', {})
+    return app.test_client()
+
+
+@pytest.fixture
+def static_app(tmp_path):
+    """A bare app with one stylesheet, fingerprinted and precompressed."""
+    static_folder = tmp_path / 'static'
+    (static_folder / 'css').mkdir(parents=True)
+    (static_folder / 'css' / 'style.css').write_text(STYLESHEET)
+    static_app = Flask(__name__, static_folder=str(static_folder))
+    assets = Assets(static_app)
+    assets.build()
+    compress_tree(static_folder / 'dist')
+    static_app.wsgi_app = PrecompressedMiddleware(
+        static_app.wsgi_app, static_app.static_folder,
+        static_app.static_url_path)
+    return static_app
+
+
+def get_page(client, encoding, etag=None):
+    headers = {'Accept-Encoding': encoding}
+    if etag is not None:
+        headers['If-None-Match'] = etag
+    return client.get('/', headers=headers)
+
+
+def test_page_cache_304_for_negotiated_etag(client):
+    response = get_page(client, 'br')
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.headers['ETag'].endswith('-br"')
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    again = get_page(client, 'br', response.headers['ETag'])
+    assert again.status_code == 304
+    assert again.headers['ETag'] == response.headers['ETag']
+
+
+def test_page_cache_200_when_encoding_changes(client):
+    etag = get_page(client, 'br').headers['ETag']
+
+    identity = get_page(client, 'identity', etag)
+    assert identity.status_code == 200
+    assert 'Content-Encoding' not in identity.headers
+    assert b'<html' in identity.data
+
+    gzipped = get_page(client, 'gzip', etag)
+    assert gzipped.status_code == 200
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+
+
+def test_uncached_page_is_compressed(monkeypatch):
+    monkeypatch.setitem(app.config, 'PAGE_CACHE', False)
+    response = get_page(app.test_client(), 'gzip')
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_precompressed_range_keeps_content_encoding(static_app):
+    url = f'/static/dist/{static_app.extensions["assets"].manifest["css/style.css"]}'
+    client = static_app.test_client()
+    full = client.get(url, headers={'Accept-Encoding': 'br'})
+    assert full.headers['Content-Encoding'] == 'br'
+    assert 'immutable' in full.headers['Cache-Control']
+
+    partial = client.get(
+        url, headers={'Accept-Encoding': 'br', 'Range': 'bytes=0-9'})
+    assert partial.status_code == 206
+    assert partial.headers['Content-Encoding'] == 'br'
+    assert partial.data == full.data[:10]
+    partial.close()
+    full.close()
+
+
+def test_precompressed_304_keeps_content_encoding(static_app):
+    url = f'/static/dist/{static_app.extensions["assets"].manifest["css/style.css"]}'
+    client = static_app.test_client()
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    response.close()
+    again = client.get(url, headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+    assert again.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in again.headers['Vary']
+
+
+def test_manifest_is_not_immutable(static_app):
+    response = static_app.test_client().get('/static/dist/manifest.json')
+    assert response.status_code == 200
+    assert 'immutable' not in response.headers.get('Cache-Control', '')
+    response.close()
+
+
+def test_check_links(tmp_path):
+    site = Flask(__name__)
+    site.config['FREEZER_DESTINATION'] = str(tmp_path)
+    freezer = SiteFreezer(site)
+    (tmp_path / 'about').mkdir()
+    (tmp_path / 'about' / 'index.html').write_text(
+        '<a href="/">home</a> <a href="https://example.com/">elsewhere</a>')
+    (tmp_path / 'index.html').write_text(
+        '<a href="/about">about</a>'
+        '<img srcset="/pic-320w.webp 320w, /pic-640w.webp 640w">')
+    (tmp_path / 'pic-320w.webp').write_bytes(b'')
+    (tmp_path / 'pic-640w.webp').write_bytes(b'')
+    freezer.check_links()
+
+    (tmp_path / 'pic-640w.webp').unlink()
+    with pytest.raises(BrokenLinkError, match='pic-640w.webp'):
+        freezer.check_links()